@@ -0,0 +1,75 @@
+"""Initial schema
+
+Matches the tables previously created by Base.metadata.create_all.
+Existing databases created that way should be marked with
+`alembic stamp 0001` before running `alembic upgrade head`.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-15 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'users',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('username', sa.String(length=50), nullable=False),
+        sa.Column('profile_name', sa.String(length=50), nullable=False),
+        sa.Column('hashed_password', sa.String(length=255), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_users_id', 'users', ['id'])
+    op.create_index('ix_users_username', 'users', ['username'], unique=True)
+    op.create_index('ix_users_profile_name', 'users', ['profile_name'])
+
+    op.create_table(
+        'sessions',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('token', sa.String(length=64), nullable=False),
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_sessions_id', 'sessions', ['id'])
+    op.create_index('ix_sessions_token', 'sessions', ['token'], unique=True)
+
+    op.create_table(
+        'messages',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('sender_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('recipient_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('content', sa.String(length=5000), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['sender_id'], ['users.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['recipient_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_messages_id', 'messages', ['id'])
+    op.create_index('ix_messages_sender_id', 'messages', ['sender_id'])
+    op.create_index('ix_messages_recipient_id', 'messages', ['recipient_id'])
+    op.create_index('ix_messages_created_at', 'messages', ['created_at'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('messages')
+    op.drop_table('sessions')
+    op.drop_table('users')
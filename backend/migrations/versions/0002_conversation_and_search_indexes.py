@@ -0,0 +1,53 @@
+"""Conversation and profile name search indexes
+
+- Composite (sender, recipient, created_at) indexes in both directions
+  replace the single-column sender_id/recipient_id indexes
+- Trigram GIN index for ILIKE '%q%' profile name search
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-15 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, Sequence[str], None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_msg_s_r_t', 'messages',
+        ['sender_id', 'recipient_id', sa.text('created_at DESC')]
+    )
+    op.create_index(
+        'ix_msg_r_s_t', 'messages',
+        ['recipient_id', 'sender_id', sa.text('created_at DESC')]
+    )
+    op.drop_index('ix_messages_sender_id', table_name='messages')
+    op.drop_index('ix_messages_recipient_id', table_name='messages')
+
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.create_index(
+        'ix_users_profile_name_trgm', 'users', ['profile_name'],
+        postgresql_using='gin',
+        postgresql_ops={'profile_name': 'gin_trgm_ops'}
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_users_profile_name_trgm', table_name='users')
+
+    op.create_index('ix_messages_recipient_id', 'messages', ['recipient_id'])
+    op.create_index('ix_messages_sender_id', 'messages', ['sender_id'])
+    op.drop_index('ix_msg_r_s_t', table_name='messages')
+    op.drop_index('ix_msg_s_r_t', table_name='messages')
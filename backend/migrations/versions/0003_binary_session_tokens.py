@@ -0,0 +1,49 @@
+"""Binary session tokens with hash index
+
+Stores session tokens as 32 raw bytes instead of 64 hex chars and
+replaces the unique b-tree index with an equality-only HASH index.
+Existing hex tokens are converted in place, but their cookies use the
+old hex format and are rejected, so users have to log in again.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-15 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, Sequence[str], None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.drop_index('ix_sessions_token', table_name='sessions')
+    op.alter_column(
+        'sessions', 'token',
+        type_=sa.LargeBinary(length=32),
+        existing_type=sa.String(length=64),
+        existing_nullable=False,
+        postgresql_using="decode(token, 'hex')"
+    )
+    op.create_index('ix_sessions_token_hash', 'sessions', ['token'], postgresql_using='hash')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_sessions_token_hash', table_name='sessions')
+    op.alter_column(
+        'sessions', 'token',
+        type_=sa.String(length=64),
+        existing_type=sa.LargeBinary(length=32),
+        existing_nullable=False,
+        postgresql_using="encode(token, 'hex')"
+    )
+    op.create_index('ix_sessions_token', 'sessions', ['token'], unique=True)
@@ -0,0 +1,39 @@
+"""Session token as primary key
+
+Drops the surrogate integer id and makes the token the primary key,
+so lookups go through the PK index and inserts maintain one index less.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-15 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, Sequence[str], None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.drop_index('ix_sessions_token_hash', table_name='sessions')
+    op.drop_index('ix_sessions_id', table_name='sessions')
+    op.drop_constraint('sessions_pkey', 'sessions', type_='primary')
+    op.drop_column('sessions', 'id')
+    op.create_primary_key('sessions_pkey', 'sessions', ['token'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('sessions_pkey', 'sessions', type_='primary')
+    op.add_column('sessions', sa.Column('id', sa.Integer(), sa.Identity(), nullable=False))
+    op.create_primary_key('sessions_pkey', 'sessions', ['id'])
+    op.create_index('ix_sessions_id', 'sessions', ['id'])
+    op.create_index('ix_sessions_token_hash', 'sessions', ['token'], postgresql_using='hash')
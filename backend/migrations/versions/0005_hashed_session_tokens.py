@@ -0,0 +1,38 @@
+"""Store SHA-256 of session tokens
+
+Replaces the raw token with the SHA-256 of its cookie value
+(unpadded base64url), so a leaked sessions table cannot be replayed.
+Existing sessions are re-keyed in place and stay valid.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-15 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, Sequence[str], None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.alter_column('sessions', 'token', new_column_name='token_hash')
+    op.execute(
+        "UPDATE sessions SET token_hash = sha256(convert_to("
+        "rtrim(translate(encode(token_hash, 'base64'), '+/', '-_'), '='), 'UTF8'))"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Hashes cannot be turned back into tokens, all sessions are dropped
+    op.execute("DELETE FROM sessions")
+    op.alter_column('sessions', 'token_hash', new_column_name='token')
@@ -0,0 +1,30 @@
+"""Index session expiry
+
+Lets the periodic purge of expired sessions use an index range scan
+instead of scanning the whole sessions table.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-15 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, Sequence[str], None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_sessions_expires_at', 'sessions', ['expires_at'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_sessions_expires_at', table_name='sessions')
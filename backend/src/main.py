@@ -1,28 +1,73 @@
-from fastapi import FastAPI, Depends, HTTPException, Response, Cookie, Request
+from fastapi import FastAPI, Depends, HTTPException, Response, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
+from pydantic import TypeAdapter
+from sqlalchemy import select, bindparam, case, or_, and_, func as sql_func
+from sqlalchemy.dialects.postgresql import distinct_on
+from sqlalchemy.ext.asyncio import AsyncSession
+from redis.exceptions import RedisError
+from cachetools import TTLCache
+from contextlib import asynccontextmanager
 from typing import Optional
-from datetime import datetime
+from datetime import datetime, timezone
 from uuid import UUID
+import asyncio
+import hmac
+import json
 import logging
+import orjson
 
-from .database import engine, get_db, Base
+from .database import engine, get_db, SessionLocal, redis_client
 from .models import User, Session as SessionModel, Message
 from .schemas import (
     UserRegister, UserLogin, UserResponse, MessageResponse, UserSearchResult,
-    MessageCreate, MessageResponseData, ConversationUser
+    MessageCreate, MessageResponseData, ConversationUser, CompactUUID
 )
 
 # Configure logging for security events
 logging.basicConfig(level=logging.INFO)
 security_logger = logging.getLogger("security")
+logger = logging.getLogger(__name__)
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+# Interval between expired session cleanups (seconds)
+SESSION_CLEANUP_INTERVAL = 60
 
-app = FastAPI(root_path="/api/v1")
+
+async def cleanup_expired_sessions():
+    """
+    Periodically delete expired sessions with a single set-based DELETE.
+    Keeps the write off the request path (expired sessions are just rejected).
+    Failures (e.g. database unreachable) are logged and retried on the next run;
+    only cancellation on shutdown ends the task.
+    """
+    while True:
+        await asyncio.sleep(SESSION_CLEANUP_INTERVAL)
+        try:
+            async with SessionLocal() as db:
+                await SessionModel.purge_expired(db)
+        except Exception:
+            logger.exception("Expired session cleanup failed")
+
+
+# Database schema is managed with Alembic migrations (alembic upgrade head)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    cleanup_task = asyncio.create_task(cleanup_expired_sessions())
+    yield
+    cleanup_task.cancel()
+    await engine.dispose()
+
+
+# No default_response_class: with response_model set, FastAPI (>= 0.130) serializes
+# straight to JSON bytes in pydantic-core (a custom response class disables that)
+app = FastAPI(root_path="/api/v1", lifespan=lifespan)
+
+
+def _json_fallback(value):
+    """Encode values orjson can't handle, e.g. a raw non-JSON request body (bytes)."""
+    if isinstance(value, bytes):
+        return value.decode('utf-8', errors='replace')
+    return str(value)
 
 
 @app.exception_handler(RequestValidationError)
@@ -89,9 +134,11 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
         
         sanitized_errors.append(sanitized_error)
     
-    return JSONResponse(
+    # Encoded with orjson directly (ORJSONResponse is deprecated in FastAPI)
+    return Response(
+        orjson.dumps({"detail": sanitized_errors}, default=_json_fallback),
         status_code=422,
-        content={"detail": sanitized_errors}
+        media_type="application/json"
     )
 
 
@@ -102,19 +149,139 @@ origins = [
     "https://localhost:8443",  # nginx reverse proxy HTTPS
 ]
 
+class CookieStateMiddleware:
+    """
+    Parses the Cookie header once per request and stores it on request.state,
+    so dependencies read cookies without re-parsing.
+    Plain ASGI middleware to avoid the overhead of BaseHTTPMiddleware.
+    """
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            scope.setdefault("state", {})["cookies"] = Request(scope).cookies
+        await self.app(scope, receive, send)
+
+
+app.add_middleware(CookieStateMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST", "OPTIONS"],  # Only methods the API uses
+    allow_headers=["Content-Type"],  # Cookies are not a CORS request header
+    max_age=86400,  # Browsers cache preflight responses for 24h
+)
+
+
+# Statements for hot queries are built once and reused,
+# so SQLAlchemy's compiled statement cache is hit on every request
+_SESSION_WITH_USER_BY_TOKEN = (
+    select(SessionModel, User)
+    .join(User, User.id == SessionModel.user_id)
+    .where(SessionModel.token_hash == bindparam("t"))
 )
+_USER_ID_BY_ID = select(User.id).where(User.id == bindparam("u"))
+_USER_BY_USERNAME = select(User).where(User.username == bindparam("n"))
+
+
+# List responses are built with model_construct from trusted DB rows and
+# dumped straight to JSON by pydantic-core, skipping response_model re-validation
+_USER_SEARCH_RESULTS = TypeAdapter(list[UserSearchResult])
+_CONVERSATIONS = TypeAdapter(list[ConversationUser])
+_MESSAGES = TypeAdapter(list[MessageResponseData])
+
+
+def _trusted_json(adapter: TypeAdapter, data) -> Response:
+    """
+    Serialize trusted, unvalidated data (built via model_construct from DB rows).
+    Never pass user input through this, it is not validated.
+    """
+    return Response(adapter.dump_json(data), media_type="application/json")
+
+
+# Max lifetime of a cached session lookup in Redis (seconds). Bounds how long a
+# logged-out token keeps working if deleting its cache entry fails.
+SESSION_CACHE_TTL = 60
+
+# Short-lived per-process cache in front of Redis, absorbs bursts of requests
+# with the same token (e.g. page load). Not invalidated across workers, so the
+# TTL bounds how long other workers accept a logged-out token.
+# Only touched from the event loop thread without awaits in between, so no locking is needed.
+LOCAL_SESSION_CACHE_TTL = 5
+_local_session_cache: TTLCache = TTLCache(maxsize=10_000, ttl=LOCAL_SESSION_CACHE_TTL)
+
+
+def _session_cache_key(token_hash: bytes) -> str:
+    """Redis key under which a session lookup is cached."""
+    return f"sess:{token_hash.hex()}"
+
+
+async def _get_cached_session(token_hash: bytes) -> Optional[dict]:
+    """
+    Read a cached session lookup from the local cache, then Redis.
+    Returns None on cache miss or if Redis is unavailable (falls back to DB).
+    """
+    cached = _local_session_cache.get(token_hash)
+    if cached is not None:
+        return cached
+    
+    try:
+        cached = await redis_client.get(_session_cache_key(token_hash))
+    except RedisError as e:
+        logger.warning(f"Session cache read failed: {e}")
+        return None
+    if not cached:
+        return None
+    
+    cached = json.loads(cached)
+    _local_session_cache[token_hash] = cached
+    return cached
+
+
+async def _cache_session(token_hash: bytes, session: SessionModel, user: User) -> None:
+    """
+    Cache a session lookup locally and in Redis (cache-aside).
+    Redis TTL is capped at SESSION_CACHE_TTL and never outlives the session.
+    """
+    remaining = int((session.expires_at - datetime.now(timezone.utc)).total_seconds())
+    ttl = min(remaining, SESSION_CACHE_TTL)
+    if ttl <= 0:
+        return
+    
+    cached = {
+        'user_id': str(user.id),
+        'username': user.username,
+        'profile_name': user.profile_name,
+        'created_at': user.created_at.isoformat(),
+        'expires_at': session.expires_at.isoformat(),
+    }
+    _local_session_cache[token_hash] = cached
+    try:
+        await redis_client.set(_session_cache_key(token_hash), json.dumps(cached), ex=ttl)
+    except RedisError as e:
+        logger.warning(f"Session cache write failed: {e}")
+
+
+async def _invalidate_cached_session(token_hash: bytes) -> None:
+    """
+    Remove a session lookup from the local cache and Redis (e.g. on logout).
+    Other worker processes may keep serving it from their local cache for up to
+    LOCAL_SESSION_CACHE_TTL seconds.
+    """
+    _local_session_cache.pop(token_hash, None)
+    try:
+        await redis_client.delete(_session_cache_key(token_hash))
+    except RedisError as e:
+        logger.warning(f"Session cache invalidation failed: {e}")
 
 
 # Dependency to get current user from session token
 async def get_current_user(
-    session_token: Optional[str] = Cookie(None, alias="session_token"),
-    db: Session = Depends(get_db)
+    request: Request,
+    db: AsyncSession = Depends(get_db)
 ) -> User:
     """
     Dependency to validate session token and retrieve current user.
@@ -123,28 +290,50 @@ async def get_current_user(
     - Validates session token from HTTPOnly cookie
     - Checks session expiration
     - Returns 401 if invalid/expired
+    
+    Performance: Session lookups are cached in-process (5s) and in Redis
+    (cache-aside), the database is only queried on cache miss.
     """
+    session_token = request.state.cookies.get("session_token")
     if not session_token:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
-    # Find session in database
-    session = db.query(SessionModel).filter(
-        SessionModel.token == session_token
-    ).first()
+    # Only the token's hash is stored and used as cache key
+    token_hash = SessionModel.hash_token(session_token)
+    
+    now = datetime.now(timezone.utc)
     
-    if not session:
+    # Try the session cache first
+    cached = await _get_cached_session(token_hash)
+    if cached and now <= datetime.fromisoformat(cached['expires_at']):
+        # Detached user object, never added to a DB session
+        return User(
+            id=UUID(cached['user_id']),
+            username=cached['username'],
+            profile_name=cached['profile_name'],
+            created_at=datetime.fromisoformat(cached['created_at'])
+        )
+    
+    # Find session and its user in a single query
+    result = (await db.execute(
+        _SESSION_WITH_USER_BY_TOKEN, {"t": token_hash}
+    )).first()
+    
+    if not result:
+        raise HTTPException(status_code=401, detail="Invalid session")
+    
+    session, user = result
+    
+    # Constant-time check of the fetched hash against the cookie's hash
+    if not hmac.compare_digest(session.token_hash, token_hash):
         raise HTTPException(status_code=401, detail="Invalid session")
     
-    # Check if session is expired
-    if session.is_expired():
-        db.delete(session)
-        db.commit()
+    # Check if session is expired (deleted later by cleanup_expired_sessions)
+    if session.is_expired(now):
+        await _invalidate_cached_session(token_hash)
         raise HTTPException(status_code=401, detail="Session expired")
     
-    # Get user
-    user = db.query(User).filter(User.id == session.user_id).first()
-    if not user:
-        raise HTTPException(status_code=401, detail="User not found")
+    await _cache_session(token_hash, session, user)
     
     return user
 
@@ -155,7 +344,7 @@ def read_root():
 
 
 @app.post("/register", response_model=UserResponse, status_code=201)
-async def register(user_data: UserRegister, db: Session = Depends(get_db)):
+async def register(user_data: UserRegister, db: AsyncSession = Depends(get_db)):
     """
     Register a new user.
     
@@ -168,7 +357,9 @@ async def register(user_data: UserRegister, db: Session = Depends(get_db)):
     Note: Consider adding rate limiting in production to prevent abuse.
     """
     # Check if username already exists
-    existing_user = db.query(User).filter(User.username == user_data.username).first()
+    existing_user = (await db.execute(
+        _USER_BY_USERNAME, {"n": user_data.username}
+    )).scalar_one_or_none()
     if existing_user:
         raise HTTPException(status_code=400, detail="Username already registered")
     
@@ -176,26 +367,22 @@ async def register(user_data: UserRegister, db: Session = Depends(get_db)):
     new_user = User(
         username=user_data.username,
         profile_name=user_data.profile_name,
-        hashed_password=User.hash_password(user_data.password)
+        hashed_password=await User.hash_password(user_data.password)
     )
     
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
-    
-    return UserResponse(
-        id=new_user.id,
-        username=new_user.username,
-        profile_name=new_user.profile_name,
-        created_at=new_user.created_at.isoformat()
-    )
+    await db.commit()
+    await db.refresh(new_user)
+    
+    # Serialized directly from the ORM object via response_model
+    return new_user
 
 
 @app.post("/login", response_model=MessageResponse)
 async def login(
     user_data: UserLogin,
     response: Response,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Login endpoint - authenticates user and creates session.
@@ -210,27 +397,29 @@ async def login(
     Note: Consider adding rate limiting to prevent brute force attacks.
     """
     # Find user by username
-    user = db.query(User).filter(User.username == user_data.username).first()
+    user = (await db.execute(
+        _USER_BY_USERNAME, {"n": user_data.username}
+    )).scalar_one_or_none()
     
-    # Use constant-time comparison to prevent timing attacks
-    if not user or not user.verify_password(user_data.password):
+    # Unknown users are checked against a dummy hash to prevent timing attacks
+    if not await User.verify_or_dummy(user, user_data.password):
         raise HTTPException(status_code=401, detail="Invalid username or password")
     
     # Create new session
-    session_token = SessionModel.generate_token()
+    token, token_hash = SessionModel.generate_token()
     new_session = SessionModel(
-        token=session_token,
+        token_hash=token_hash,
         user_id=user.id,
         expires_at=SessionModel.calculate_expiry(days=1)
     )
     
     db.add(new_session)
-    db.commit()
+    await db.commit()
     
     # Set secure cookie
     response.set_cookie(
         key="session_token",
-        value=session_token,
+        value=token,
         httponly=True,  # Prevents JavaScript access (XSS protection)
         secure=True,     # Only sent over HTTPS
         samesite="lax",  # CSRF protection
@@ -242,25 +431,33 @@ async def login(
 
 @app.post("/logout", response_model=MessageResponse)
 async def logout(
+    request: Request,
     response: Response,
-    session_token: Optional[str] = Cookie(None, alias="session_token"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Logout endpoint - invalidates session.
     
     Security features:
-    - Removes session from database
+    - Removes session from database and session cache
     - Clears session cookie
     """
+    session_token = request.state.cookies.get("session_token")
     if session_token:
+        token_hash = SessionModel.hash_token(session_token)
+        
         # Delete session from database
-        session = db.query(SessionModel).filter(
-            SessionModel.token == session_token
-        ).first()
+        session = (await db.execute(
+            select(SessionModel).where(SessionModel.token_hash == token_hash)
+        )).scalar_one_or_none()
         if session:
-            db.delete(session)
-            db.commit()
+            await db.delete(session)
+            await db.commit()
+        
+        # Drop cached session lookup. Other workers may still accept the token
+        # for up to LOCAL_SESSION_CACHE_TTL (local cache), or SESSION_CACHE_TTL
+        # if the Redis delete fails.
+        await _invalidate_cached_session(token_hash)
     
     # Clear cookie
     response.delete_cookie(key="session_token")
@@ -276,12 +473,7 @@ async def get_me(current_user: User = Depends(get_current_user)):
     Security: Only returns non-sensitive user data.
     Requires valid session token.
     """
-    return UserResponse(
-        id=current_user.id,
-        username=current_user.username,
-        profile_name=current_user.profile_name,
-        created_at=current_user.created_at.isoformat()
-    )
+    return current_user
 
 
 @app.get("/users/search", response_model=list[UserSearchResult])
@@ -289,7 +481,7 @@ async def search_users(
     q: str,
     limit: int = 20,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Search for users by profile name.
@@ -324,22 +516,25 @@ async def search_users(
     search_query = q.strip().replace('%', '\\%').replace('_', '\\_')
     
     # Case-insensitive search using ILIKE (PostgreSQL)
-    users = db.query(User).filter(
-        User.profile_name.ilike(f"%{search_query}%")
-    ).limit(limit).all()
+    # Only load the needed columns, no ORM objects
+    users = (await db.execute(
+        select(User.id, User.profile_name).where(
+            User.profile_name.ilike(f"%{search_query}%")
+        ).limit(limit)
+    )).all()
     
     # Return only safe fields (id and profile_name, NOT username)
-    return [
-        UserSearchResult(id=user.id, profile_name=user.profile_name)
-        for user in users
-    ]
+    return _trusted_json(_USER_SEARCH_RESULTS, [
+        UserSearchResult.model_construct(id=row.id, profile_name=row.profile_name)
+        for row in users
+    ])
 
 
 @app.post("/messages", response_model=MessageResponseData, status_code=201)
 async def send_message(
     message_data: MessageCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Send a message to another user.
@@ -358,7 +553,9 @@ async def send_message(
         raise HTTPException(status_code=400, detail="Cannot send message to yourself")
     
     # Verify recipient exists
-    recipient = db.query(User).filter(User.id == message_data.recipient_id).first()
+    recipient = (await db.execute(
+        _USER_ID_BY_ID, {"u": message_data.recipient_id}
+    )).scalar_one_or_none()
     if not recipient:
         raise HTTPException(status_code=404, detail="Recipient not found")
     
@@ -370,22 +567,16 @@ async def send_message(
     )
     
     db.add(new_message)
-    db.commit()
-    db.refresh(new_message)
-    
-    return MessageResponseData(
-        id=new_message.id,
-        sender_id=new_message.sender_id,
-        recipient_id=new_message.recipient_id,
-        content=new_message.content,
-        created_at=new_message.created_at.isoformat()
-    )
+    await db.commit()
+    await db.refresh(new_message)
+    
+    return new_message
 
 
 @app.get("/messages/conversations", response_model=list[ConversationUser])
 async def get_conversations(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Get list of all users you've had conversations with.
@@ -393,72 +584,65 @@ async def get_conversations(
     
     Security: Only shows conversations involving the authenticated user.
     """
-    from sqlalchemy import or_, and_, func as sql_func
-    from sqlalchemy.orm import aliased
+    # The other participant of each message involving current_user
+    other_user_id = case(
+        (Message.sender_id == current_user.id, Message.recipient_id),
+        else_=Message.sender_id
+    )
     
-    # Subquery to get the latest message for each conversation
-    # A conversation is between current_user and another user
-    latest_msg_subq = (
-        db.query(
-            sql_func.greatest(Message.sender_id, Message.recipient_id).label('user1'),
-            sql_func.least(Message.sender_id, Message.recipient_id).label('user2'),
-            sql_func.max(Message.created_at).label('last_time')
+    # Conversation key: the (unordered) pair of participants
+    user_low = sql_func.least(Message.sender_id, Message.recipient_id)
+    user_high = sql_func.greatest(Message.sender_id, Message.recipient_id)
+    
+    # Latest message per conversation in a single scan via DISTINCT ON (PostgreSQL).
+    # Only the first 101 chars of the content are fetched (enough to tell if it was truncated)
+    latest_msgs = (
+        select(
+            other_user_id.label('other_user_id'),
+            sql_func.substring(Message.content, 1, 101).label('preview'),
+            Message.created_at
         )
-        .filter(
+        .where(
             or_(
                 Message.sender_id == current_user.id,
                 Message.recipient_id == current_user.id
             )
         )
-        .group_by(
-            sql_func.greatest(Message.sender_id, Message.recipient_id),
-            sql_func.least(Message.sender_id, Message.recipient_id)
-        )
-        .subquery()
+        .ext(distinct_on(user_low, user_high))
+        .order_by(user_low, user_high, Message.created_at.desc())
+        .subquery('latest_msgs')
     )
     
-    # Get the actual latest messages with their content
-    conversations_data = (
-        db.query(Message, User)
-        .join(
-            latest_msg_subq,
-            and_(
-                or_(
-                    and_(Message.sender_id == latest_msg_subq.c.user1, Message.recipient_id == latest_msg_subq.c.user2),
-                    and_(Message.sender_id == latest_msg_subq.c.user2, Message.recipient_id == latest_msg_subq.c.user1)
-                ),
-                Message.created_at == latest_msg_subq.c.last_time
-            )
+    # Join the other user and sort conversations by most recent message
+    conversations_data = (await db.execute(
+        select(
+            User.id,
+            User.profile_name,
+            latest_msgs.c.preview,
+            latest_msgs.c.created_at
         )
-        .join(
-            User,
-            or_(
-                and_(User.id == Message.sender_id, Message.sender_id != current_user.id),
-                and_(User.id == Message.recipient_id, Message.recipient_id != current_user.id)
-            )
-        )
-        .order_by(Message.created_at.desc())
-        .all()
-    )
-    
-    return [
-        ConversationUser(
-            id=user.id,
-            profile_name=user.profile_name,
-            last_message=message.content[:100] + ('...' if len(message.content) > 100 else ''),
-            last_message_time=message.created_at.isoformat()
+        .join(User, User.id == latest_msgs.c.other_user_id)
+        .order_by(latest_msgs.c.created_at.desc())
+    )).all()
+    
+    return _trusted_json(_CONVERSATIONS, [
+        ConversationUser.model_construct(
+            id=row.id,
+            profile_name=row.profile_name,
+            last_message=row.preview[:100] + ('...' if len(row.preview) > 100 else ''),
+            last_message_time=row.created_at
         )
-        for message, user in conversations_data
-    ]
+        for row in conversations_data
+    ])
 
 
 @app.get("/messages/{user_id}", response_model=list[MessageResponseData])
 async def get_conversation_messages(
-    user_id: UUID,
+    user_id: CompactUUID,
     limit: int = 100,
     offset: int = 0,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Get all messages between you and a specific user.
@@ -473,10 +657,10 @@ async def get_conversation_messages(
     - limit: Max messages to return (default 100, max 500)
     - offset: Skip first N messages (for pagination)
     """
-    from sqlalchemy import or_, and_
-    
     # Verify the other user exists
-    other_user = db.query(User).filter(User.id == user_id).first()
+    other_user = (await db.execute(
+        _USER_ID_BY_ID, {"u": user_id}
+    )).scalar_one_or_none()
     if not other_user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -487,9 +671,15 @@ async def get_conversation_messages(
         limit = 100
     
     # Get messages between current_user and the specified user
-    messages = (
-        db.query(Message)
-        .filter(
+    messages = (await db.execute(
+        select(
+            Message.id,
+            Message.sender_id,
+            Message.recipient_id,
+            Message.content,
+            Message.created_at
+        )
+        .where(
             or_(
                 and_(Message.sender_id == current_user.id, Message.recipient_id == user_id),
                 and_(Message.sender_id == user_id, Message.recipient_id == current_user.id)
@@ -498,18 +688,10 @@ async def get_conversation_messages(
         .order_by(Message.created_at.asc())  # Oldest first
         .offset(offset)
         .limit(limit)
-        .all()
-    )
+    )).all()
     
-    return [
-        MessageResponseData(
-            id=msg.id,
-            sender_id=msg.sender_id,
-            recipient_id=msg.recipient_id,
-            content=msg.content,
-            created_at=msg.created_at.isoformat()
-        )
-        for msg in messages
-    ]
+    return _trusted_json(_MESSAGES, [
+        MessageResponseData.model_construct(**row._mapping) for row in messages
+    ])
 
  
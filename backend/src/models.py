@@ -1,12 +1,94 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import String, LargeBinary, DateTime, ForeignKey, Index, delete, desc
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Optional
+import asyncio
+import base64
 import bcrypt
+import hashlib
+import importlib
+import logging
+import os
 import secrets
+import threading
+import time
 import uuid
 from .database import Base
 
+logger = logging.getLogger(__name__)
+
+
+# Prefix marking password hashes that were pre-hashed with BLAKE2b before bcrypt
+PASSWORD_HASH_PREFIX = "$blake2b$v1$"
+
+
+def _utf8(value: str) -> bytes:
+    """UTF-8 encode a string, taking the ASCII fast path when possible."""
+    return value.encode('ascii') if value.isascii() else value.encode('utf-8')
+
+
+def _prehash_password(password: str) -> bytes:
+    """
+    Pre-hash a password with BLAKE2b before passing it to bcrypt.
+    bcrypt only uses the first 72 bytes of its input; the base64-encoded
+    48-byte digest (64 chars, no NUL bytes) keeps every password byte relevant.
+    """
+    digest = hashlib.blake2b(_utf8(password), digest_size=48).digest()
+    return base64.b64encode(digest)
+
+
+def _load_bcrypt_backend():
+    """
+    Select the bcrypt implementation.
+    BCRYPT_BACKEND may name a module with the `bcrypt` package API
+    (gensalt, hashpw, checkpw), e.g. a build optimized for the host CPU.
+    Falls back to the stock `bcrypt` package.
+    """
+    name = os.getenv("BCRYPT_BACKEND")
+    if name:
+        try:
+            return importlib.import_module(name)
+        except ImportError as e:
+            logger.warning(f"bcrypt backend {name!r} unavailable, using bcrypt: {e}")
+    return bcrypt
+
+
+_bcrypt_backend = _load_bcrypt_backend()
+
+# Dedicated thread pool for bcrypt, sized to the CPU count.
+# bcrypt releases the GIL, so hashes run in parallel across cores
+# without blocking the event loop.
+_BCRYPT_POOL = ThreadPoolExecutor(max_workers=os.cpu_count(), thread_name_prefix="bcrypt")
+
+
+def _hash_password(password: str) -> str:
+    """Hash a password using BLAKE2b pre-hashing and bcrypt (blocking)."""
+    salt = _bcrypt_backend.gensalt(rounds=12)
+    hashed = _bcrypt_backend.hashpw(_prehash_password(password), salt)
+    return PASSWORD_HASH_PREFIX + hashed.decode('utf-8')
+
+
+def _verify_password(password: str, hashed_password: str) -> bool:
+    """Verify a password against a pre-hashed or legacy bcrypt hash (blocking)."""
+    if hashed_password.startswith(PASSWORD_HASH_PREFIX):
+        hashed_bytes = hashed_password[len(PASSWORD_HASH_PREFIX):].encode('ascii')
+        return _bcrypt_backend.checkpw(_prehash_password(password), hashed_bytes)
+    
+    # Legacy hashes: bcrypt only ever used the first 72 bytes
+    password_bytes = _utf8(password)[:72]
+    hashed_bytes = hashed_password.encode('ascii')
+    return _bcrypt_backend.checkpw(password_bytes, hashed_bytes)
+
+
+# Hash checked against when a login names an unknown user, so that
+# "no such user" costs the same bcrypt work as "wrong password".
+_DUMMY_HASH = _hash_password(secrets.token_urlsafe(16))
+
 
 class User(Base):
     """
@@ -14,34 +96,86 @@ class User(Base):
     
     Security features:
     - UUID primary key (prevents enumeration attacks)
-    - Passwords are hashed using bcrypt (never stored in plaintext)
+    - Passwords are pre-hashed with BLAKE2b and hashed using bcrypt (never stored in plaintext)
     - Username has length constraints to prevent abuse
     - Created timestamp for audit trails
+    
+    Performance: Trigram GIN index on profile_name makes the
+    substring (ILIKE '%q%') user search index-backed.
     """
     __tablename__ = "users"
+    __table_args__ = (
+        Index(
+            'ix_users_profile_name_trgm', 'profile_name',
+            postgresql_using='gin',
+            postgresql_ops={'profile_name': 'gin_trgm_ops'}
+        ),
+    )
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
-    username = Column(String(50), unique=True, nullable=False, index=True)
-    profile_name = Column(String(50), nullable=False, index=True)  # Display name for searching
-    hashed_password = Column(String(255), nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
+    username: Mapped[str] = mapped_column(String(50), unique=True, index=True)
+    profile_name: Mapped[str] = mapped_column(String(50), index=True)  # Display name for searching
+    hashed_password: Mapped[str] = mapped_column(String(255))
+    created_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), server_default=func.now())
     
     @staticmethod
-    def hash_password(password: str) -> str:
+    async def hash_password(password: str) -> str:
         """
-        Hash a password using bcrypt.
+        Hash a password using BLAKE2b pre-hashing and bcrypt.
         Uses cost factor 12 (2^12 iterations) for security.
+        Runs on the bcrypt thread pool.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_BCRYPT_POOL, _hash_password, password)
+    
+    async def verify_password(self, password: str) -> bool:
         """
-        password_bytes = password.encode('utf-8')
-        salt = bcrypt.gensalt(rounds=12)
-        hashed = bcrypt.hashpw(password_bytes, salt)
-        return hashed.decode('utf-8')
+        Verify a password against the hashed password.
+        Supports both pre-hashed and legacy plain bcrypt hashes.
+        Runs on the bcrypt thread pool.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            _BCRYPT_POOL, _verify_password, password, self.hashed_password
+        )
     
-    def verify_password(self, password: str) -> bool:
-        """Verify a password against the hashed password."""
-        password_bytes = password.encode('utf-8')
-        hashed_bytes = self.hashed_password.encode('utf-8')
-        return bcrypt.checkpw(password_bytes, hashed_bytes)
+    @staticmethod
+    async def verify_or_dummy(user: Optional["User"], password: str) -> bool:
+        """
+        Verify a password for a user that may not exist.
+        Missing users are checked against a dummy hash so both cases
+        take the same time (prevents username enumeration via timing).
+        """
+        if user is None:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(_BCRYPT_POOL, _verify_password, password, _DUMMY_HASH)
+            return False
+        return await user.verify_password(password)
+
+
+# Per-process buffer of OS entropy for session tokens, refilled with one
+# os.urandom call per 2048 tokens instead of one getrandom syscall per token.
+# Cleared after fork so child processes never hand out the parent's bytes.
+_ENTROPY_REFILL = 65536
+_entropy_pool = bytearray()
+_entropy_lock = threading.Lock()
+os.register_at_fork(after_in_child=_entropy_pool.clear)
+
+
+def _token_bytes(n: int = 32) -> bytes:
+    """Take n bytes of OS entropy from the process pool (each byte used once)."""
+    with _entropy_lock:
+        if len(_entropy_pool) < n:
+            _entropy_pool.extend(os.urandom(_ENTROPY_REFILL))
+        chunk = bytes(_entropy_pool[-n:])
+        del _entropy_pool[-n:]
+    return chunk
+
+
+@lru_cache(maxsize=16)
+def _expiry(days: int, now_bucket: int) -> datetime:
+    """Expiry timestamp, shared by all sessions created within the same second."""
+    return datetime.fromtimestamp(now_bucket + days * 86400, tz=timezone.utc)
 
 
 class Session(Base):
@@ -53,30 +187,55 @@ class Session(Base):
     - Session expiration (7 days default)
     - Foreign key constraint ensures session validity
     - UUID-based user references (prevents enumeration)
+    
+    Performance: Only the SHA-256 of the token is stored (fixed-width
+    32 bytes) and is the primary key, so lookups use the PK index directly.
+    The raw token (base64url, 43 chars) lives only in the client's cookie.
+    The expires_at index keeps purging expired sessions a range scan.
     """
     __tablename__ = "sessions"
     
-    id = Column(Integer, primary_key=True, index=True)
-    token = Column(String(64), unique=True, nullable=False, index=True)  # 32 bytes = 64 hex chars
-    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    expires_at = Column(DateTime(timezone=True), nullable=False)
+    token_hash: Mapped[bytes] = mapped_column(LargeBinary(32), primary_key=True)  # SHA-256 of the token
+    user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"))
+    created_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), index=True)
+    
+    @classmethod
+    def generate_token(cls) -> tuple[str, bytes]:
+        """
+        Generate a cryptographically secure random session token.
+        Returns the raw token (for the cookie) and its hash (for the DB).
+        """
+        # 32 bytes = 256 bits, unpadded base64url (43 chars)
+        token = base64.urlsafe_b64encode(_token_bytes(32)).rstrip(b'=').decode('ascii')
+        return token, cls.hash_token(token)
     
     @staticmethod
-    def generate_token() -> str:
-        """Generate a cryptographically secure random session token."""
-        return secrets.token_hex(32)  # 32 bytes = 64 hex characters
+    def hash_token(token: str) -> bytes:
+        """Hash a session token for storage and lookup (SHA-256, 32 bytes)."""
+        return hashlib.sha256(_utf8(token)).digest()
     
     @staticmethod
     def calculate_expiry(days: int = 7) -> datetime:
-        """Calculate session expiration time (default 7 days)."""
-        from datetime import timezone
-        return datetime.now(timezone.utc) + timedelta(days=days)
+        """Calculate session expiration time (default 7 days, 1 second granularity)."""
+        return _expiry(days, int(time.time()))
     
-    def is_expired(self) -> bool:
-        """Check if the session has expired."""
-        from datetime import timezone
-        return datetime.now(timezone.utc) > self.expires_at
+    def is_expired(self, now: Optional[datetime] = None) -> bool:
+        """
+        Check if the session has expired.
+        Pass `now` to reuse one timestamp across several checks.
+        """
+        return (now or datetime.now(timezone.utc)) > self.expires_at
+    
+    @classmethod
+    async def purge_expired(cls, db: AsyncSession) -> int:
+        """
+        Delete all expired sessions with a single server-side DELETE.
+        Returns the number of deleted sessions.
+        """
+        result = await db.execute(delete(cls).where(cls.expires_at < func.now()))
+        await db.commit()
+        return result.rowcount
 
 
 class Message(Base):
@@ -88,11 +247,18 @@ class Message(Base):
     - Foreign key constraints ensure sender/recipient validity
     - Timestamp for message ordering
     - Content length limit enforced at database level
+    
+    Performance: Composite indexes on both (sender, recipient) directions
+    allow conversation queries to use index range scans ordered by time.
     """
     __tablename__ = "messages"
+    __table_args__ = (
+        Index('ix_msg_s_r_t', 'sender_id', 'recipient_id', desc('created_at')),
+        Index('ix_msg_r_s_t', 'recipient_id', 'sender_id', desc('created_at')),
+    )
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
-    sender_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
-    recipient_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
-    content = Column(String(5000), nullable=False)  # Max 5000 chars
-    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
+    sender_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"))
+    recipient_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"))
+    content: Mapped[str] = mapped_column(String(5000))  # Max 5000 chars
+    created_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), server_default=func.now(), index=True)
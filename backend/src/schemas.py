@@ -1,8 +1,79 @@
-from pydantic import BaseModel, Field, field_validator
-import re
+from pydantic import BaseModel, BeforeValidator, ConfigDict, Field, PlainSerializer, field_validator
+from datetime import datetime
+from typing import Annotated
+import base64
+import binascii
 from uuid import UUID
 
 
+# Format patterns are checked by pydantic-core (Rust) together with the length limits
+_USERNAME_PATTERN = r'^[a-zA-Z0-9_]+$'
+_PROFILE_NAME_PATTERN = r'^[a-zA-Z0-9 ._-]+$'
+
+# Password character classes, collected as bit flags in a single pass
+_HAS_UPPER = 0b0001
+_HAS_LOWER = 0b0010
+_HAS_DIGIT = 0b0100
+_HAS_SPECIAL = 0b1000
+_HAS_ALL = 0b1111
+_SPECIAL_CHARS = '!@#$%^&*(),.?":{}|<>'
+
+
+def _build_char_classes() -> bytes:
+    """Map every byte value to its password character class flag."""
+    table = bytearray(256)
+    for c in range(128):
+        ch = chr(c)
+        if 'A' <= ch <= 'Z':
+            table[c] = _HAS_UPPER
+        elif 'a' <= ch <= 'z':
+            table[c] = _HAS_LOWER
+        elif '0' <= ch <= '9':
+            table[c] = _HAS_DIGIT
+        elif ch in _SPECIAL_CHARS:
+            table[c] = _HAS_SPECIAL
+    return bytes(table)
+
+
+# Byte -> class lookup; UTF-8 multi-byte sequences (>= 0x80) classify as 0
+_CHAR_CLASSES = _build_char_classes()
+
+
+def _parse_compact_uuid(v):
+    """Accept a 22-char base64url UUID; anything else is left to UUID validation."""
+    if isinstance(v, str) and len(v) == 22:
+        try:
+            return UUID(bytes=base64.urlsafe_b64decode(v + '=='))
+        except (binascii.Error, ValueError):
+            return v
+    return v
+
+
+def _serialize_compact_uuid(v: UUID) -> str:
+    """Encode a UUID as unpadded base64url (22 chars instead of 36)."""
+    return base64.urlsafe_b64encode(v.bytes).rstrip(b'=').decode('ascii')
+
+
+# UUID sent to the frontend as 22-char base64url, accepts both forms as input
+CompactUUID = Annotated[
+    UUID,
+    BeforeValidator(_parse_compact_uuid),
+    PlainSerializer(_serialize_compact_uuid, return_type=str),
+]
+
+
+def _serialize_epoch_millis(v: datetime) -> int:
+    """Encode a timestamp as integer milliseconds since the Unix epoch."""
+    return int(v.timestamp() * 1000)
+
+
+# Timestamp sent to the frontend as epoch milliseconds instead of an ISO string
+EpochMillis = Annotated[
+    datetime,
+    PlainSerializer(_serialize_epoch_millis, return_type=int),
+]
+
+
 class UserRegister(BaseModel):
     """
     User registration request schema with security validations.
@@ -12,36 +83,27 @@ class UserRegister(BaseModel):
     - Profile name: 3-30 chars, displayed to other users (searchable)
     - Password: 8-128 chars minimum for security
     """
-    username: str = Field(..., min_length=3, max_length=30)
-    profile_name: str = Field(..., min_length=3, max_length=30)
+    # Only letters, numbers and underscores (prevents injection, clean usernames)
+    username: str = Field(..., min_length=3, max_length=30, pattern=_USERNAME_PATTERN)
+    # Letters, numbers, spaces, hyphens, underscores, and periods
+    profile_name: str = Field(..., min_length=3, max_length=30, pattern=_PROFILE_NAME_PATTERN)
     password: str = Field(..., min_length=8, max_length=128)
     
-    @field_validator('username')
-    @classmethod
-    def validate_username(cls, v: str) -> str:
-        """
-        Validate username format.
-        Only allows alphanumeric characters and underscores.
-        Prevents injection attacks and ensures clean usernames.
-        """
-        if not re.match(r'^[a-zA-Z0-9_]+$', v):
-            raise ValueError('Username must contain only letters, numbers, and underscores')
-        return v
+    model_config = ConfigDict(extra='forbid')
     
-    @field_validator('profile_name')
+    @field_validator('profile_name', mode='before')
     @classmethod
-    def validate_profile_name(cls, v: str) -> str:
+    def validate_profile_name(cls, v):
         """
-        Validate profile name format.
-        Allows alphanumeric, spaces, and limited special chars for display names.
-        More permissive than username since it's just for display.
+        Normalize profile name.
+        Runs before the Field constraints, so the length limits and the
+        character pattern see the stripped value.
         """
+        if not isinstance(v, str):
+            return v  # Left to the str type check
         v = v.strip()  # Remove leading/trailing whitespace
         if not v:
             raise ValueError('Profile name cannot be empty')
-        # Allow letters, numbers, spaces, hyphens, underscores, and periods
-        if not re.match(r'^[a-zA-Z0-9 ._-]+$', v):
-            raise ValueError('Profile name can only contain letters, numbers, spaces, and ._- characters')
         return v
     
     @field_validator('password')
@@ -50,22 +112,30 @@ class UserRegister(BaseModel):
         """
         Validate password strength.
         Requires at least one uppercase, lowercase, digit, and special char.
+        Classifies the UTF-8 bytes via a lookup table in a single pass,
+        stopping once all classes are found.
         """
-        if not re.search(r'[A-Z]', v):
+        flags = 0
+        for b in v.encode('utf-8'):
+            flags |= _CHAR_CLASSES[b]
+            if flags == _HAS_ALL:
+                return v
+        
+        if not flags & _HAS_UPPER:
             raise ValueError('Password must contain at least one uppercase letter')
-        if not re.search(r'[a-z]', v):
+        if not flags & _HAS_LOWER:
             raise ValueError('Password must contain at least one lowercase letter')
-        if not re.search(r'\d', v):
+        if not flags & _HAS_DIGIT:
             raise ValueError('Password must contain at least one digit')
-        if not re.search(r'[!@#$%^&*(),.?":{}|<>]', v):
-            raise ValueError('Password must contain at least one special character')
-        return v
+        raise ValueError('Password must contain at least one special character')
 
 
 class UserLogin(BaseModel):
     """User login request schema."""
     username: str = Field(..., min_length=3, max_length=30)
     password: str = Field(..., min_length=8, max_length=128)
+    
+    model_config = ConfigDict(extra='forbid')
 
 
 class UserResponse(BaseModel):
@@ -78,13 +148,12 @@ class UserResponse(BaseModel):
     but profile_name is what other users see.
     Uses UUID instead of sequential integer for security (prevents enumeration).
     """
-    id: UUID
+    id: CompactUUID
     username: str
     profile_name: str
-    created_at: str
+    created_at: EpochMillis
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True, frozen=True)
 
 
 class UserSearchResult(BaseModel):
@@ -95,16 +164,17 @@ class UserSearchResult(BaseModel):
     Does NOT expose username (login credential) to prevent enumeration attacks.
     Uses UUID for id to prevent sequential ID guessing.
     """
-    id: UUID
+    id: CompactUUID
     profile_name: str
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True, frozen=True)
 
 
 class MessageResponse(BaseModel):
     """Generic message response."""
     message: str
+    
+    model_config = ConfigDict(frozen=True)
 
 
 class MessageCreate(BaseModel):
@@ -113,20 +183,23 @@ class MessageCreate(BaseModel):
     
     Security:
     - Content length limited to 5000 chars (prevents DOS)
-    - recipient_id must be valid UUID
-    - Content will be sanitized to prevent XSS
+    - recipient_id must be valid UUID (canonical or base64url)
+    - Content is stored as sent; the frontend escapes it on render (XSS)
     """
-    recipient_id: UUID
+    recipient_id: CompactUUID
     content: str = Field(..., min_length=1, max_length=5000)
     
+    model_config = ConfigDict(extra='forbid')
+    
     @field_validator('content')
     @classmethod
     def validate_content(cls, v: str) -> str:
         """
         Validate message content.
-        Strips whitespace and ensures non-empty message.
+        Normalizes line breaks, strips whitespace and ensures non-empty message.
+        The text is stored as sent (not escaped); the frontend escapes on render.
         """
-        v = v.strip()
+        v = v.replace('\r\n', '\n').replace('\r', '\n').strip()
         if not v:
             raise ValueError('Message content cannot be empty')
         return v
@@ -139,14 +212,13 @@ class MessageResponseData(BaseModel):
     Security: Returns all message data for authorized users only.
     Frontend should display sender/recipient profile_names, not IDs.
     """
-    id: UUID
-    sender_id: UUID
-    recipient_id: UUID
+    id: CompactUUID
+    sender_id: CompactUUID
+    recipient_id: CompactUUID
     content: str
-    created_at: str
+    created_at: EpochMillis
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True, frozen=True)
 
 
 class ConversationUser(BaseModel):
@@ -154,10 +226,9 @@ class ConversationUser(BaseModel):
     User info in conversation list.
     Shows the other person in the conversation.
     """
-    id: UUID
+    id: CompactUUID
     profile_name: str
     last_message: str
-    last_message_time: str
+    last_message_time: EpochMillis
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True, frozen=True)
@@ -17,7 +17,7 @@ export interface Conversation {
   id: string;
   profile_name: string;
   last_message?: string;
-  last_message_time?: string;
+  last_message_time?: string | number;
 }
 
 export interface User {
@@ -37,7 +37,7 @@ export interface ChatMessage {
   sender_id?: string | null;
   recipient_id?: string | null;
   content: string;
-  created_at?: string;
+  created_at?: string | number;
 }
 
 export interface AuthUser {